@@ -0,0 +1,223 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+
+# Paths that fetch from GitHub or call the model (search ingests repos not yet cached)
+EXPENSIVE_PATHS = ("/api/analyze", "/api/chat", "/api/search")
+# Long-running streams get their own class so they cannot hold every expensive slot
+BATCH_PATHS = ("/api/analyze/batch",)
+
+# Per-client token bucket (requests per second refill, burst capacity)
+CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "1"))
+CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+EXPENSIVE_COST = float(os.getenv("ADMISSION_EXPENSIVE_COST", "5"))
+
+# Concurrent requests in flight per endpoint class
+EXPENSIVE_CONCURRENCY = int(os.getenv("ADMISSION_EXPENSIVE_CONCURRENCY", "8"))
+BATCH_CONCURRENCY = int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "2"))
+CHEAP_CONCURRENCY = int(os.getenv("ADMISSION_CHEAP_CONCURRENCY", "64"))
+
+# Longest a request may wait for a slot before it is shed, in seconds
+EXPENSIVE_MAX_QUEUE = float(os.getenv("ADMISSION_EXPENSIVE_MAX_QUEUE", "2"))
+CHEAP_MAX_QUEUE = float(os.getenv("ADMISSION_CHEAP_MAX_QUEUE", "0.5"))
+
+# Number of proxies in front of the app. Each appends the address it received
+# the request from to X-Forwarded-For, so the entry this many hops from the end
+# is the client as seen by the outermost proxy; earlier entries are client-set
+# and can be spoofed. 0 keys on the peer address.
+TRUSTED_PROXY_HOPS = int(os.getenv("ADMISSION_TRUSTED_PROXY_HOPS", "0"))
+
+# Clients idle this long have their bucket dropped, and at most this many are tracked
+CLIENT_IDLE_SECONDS = 600
+MAX_TRACKED_CLIENTS = int(os.getenv("ADMISSION_MAX_TRACKED_CLIENTS", "10000"))
+
+
+class TokenBucket:
+    """Refilling token bucket for one client"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """
+        Try to spend tokens
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until enough tokens refill
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else 60
+
+    def charge(self, cost: float) -> float:
+        """
+        Spend tokens unconditionally, going into debt if needed
+
+        Returns:
+            Seconds until the bucket is positive again (0 if it still is)
+        """
+        self.take(0)
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate if self.rate > 0 else 60
+
+
+class AdmissionController:
+    """
+    Admission state: per-client token buckets, per-class concurrency limits and counters
+
+    Each client (peer address, or the X-Forwarded-For entry added by the
+    outermost of ADMISSION_TRUSTED_PROXY_HOPS proxies) has a token bucket;
+    expensive endpoints cost more tokens. Expensive, batch and cheap
+    endpoints have separate concurrency limits, and a request that cannot
+    get a slot within its class's maximum queue time is shed with a 503 and
+    Retry-After instead of waiting. The health check is never throttled.
+    """
+
+    def __init__(self):
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.classes = {
+            "expensive": {"limit": EXPENSIVE_CONCURRENCY, "max_queue": EXPENSIVE_MAX_QUEUE},
+            "batch": {"limit": BATCH_CONCURRENCY, "max_queue": EXPENSIVE_MAX_QUEUE},
+            "cheap": {"limit": CHEAP_CONCURRENCY, "max_queue": CHEAP_MAX_QUEUE},
+        }
+        self.semaphores = {}
+        self.counters = {
+            name: {"admitted": 0, "rate_limited": 0, "shed": 0, "in_flight": 0, "queue_time_ewma_ms": 0.0}
+            for name in self.classes
+        }
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def client_key(self, scope) -> str:
+        for name, value in scope.get("headers", []) if TRUSTED_PROXY_HOPS > 0 else []:
+            if name == b"x-forwarded-for":
+                hops = [hop.strip() for hop in value.decode("latin-1").split(",")]
+                return hops[max(len(hops) - TRUSTED_PROXY_HOPS, 0)]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _bucket(self, client: str) -> TokenBucket:
+        """Get a client's bucket (caller holds the lock), most recently used last"""
+        now = time.monotonic()
+        if now - self._last_sweep > CLIENT_IDLE_SECONDS:
+            for key in [k for k, b in self.buckets.items() if now - b.updated >= CLIENT_IDLE_SECONDS]:
+                del self.buckets[key]
+            self._last_sweep = now
+
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            while len(self.buckets) >= MAX_TRACKED_CLIENTS:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[client] = TokenBucket(CLIENT_RATE, CLIENT_BURST)
+        else:
+            self.buckets.move_to_end(client)
+        return bucket
+
+    def take_tokens(self, client: str, cost: float) -> float:
+        """Spend tokens if available; returns 0 or seconds until they would be"""
+        with self._lock:
+            return self._bucket(client).take(cost)
+
+    def charge(self, client: str, cost: float) -> float:
+        """
+        Charge extra cost for work discovered after admission (e.g. batch size)
+
+        The client's bucket may go negative, delaying its next requests in
+        proportion to the work done.
+
+        Returns:
+            Seconds until the client may make requests again (0 if it already may)
+        """
+        with self._lock:
+            return self._bucket(client).charge(cost)
+
+    def classify(self, path: str) -> str:
+        """Endpoint class for a request path"""
+        if path.startswith(BATCH_PATHS):
+            return "batch"
+        return "expensive" if path.startswith(EXPENSIVE_PATHS) else "cheap"
+
+    def semaphore(self, name: str) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the server's event loop
+        if name not in self.semaphores:
+            self.semaphores[name] = asyncio.Semaphore(self.classes[name]["limit"])
+        return self.semaphores[name]
+
+    def stats(self) -> Dict[str, Dict]:
+        """Counters and configured limits per endpoint class"""
+        return {
+            name: {**self.counters[name], **self.classes[name], "clients_tracked": len(self.buckets)}
+            for name in self.classes
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to every HTTP request"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] == "/":
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        name = controller.classify(scope["path"])
+        counters = controller.counters[name]
+
+        cost = 1 if name == "cheap" else EXPENSIVE_COST
+        retry_after = controller.take_tokens(controller.client_key(scope), cost)
+        if retry_after:
+            counters["rate_limited"] += 1
+            await self._reject(send, 429, "Too many requests, slow down", retry_after)
+            return
+
+        semaphore = controller.semaphore(name)
+        max_queue = controller.classes[name]["max_queue"]
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max_queue)
+        except asyncio.TimeoutError:
+            counters["shed"] += 1
+            await self._reject(send, 503, "Server is busy, try again shortly", max_queue * 2)
+            return
+
+        queue_ms = (time.monotonic() - queued_at) * 1000
+        counters["admitted"] += 1
+        counters["in_flight"] += 1
+        counters["queue_time_ewma_ms"] = round(0.9 * counters["queue_time_ewma_ms"] + 0.1 * queue_ms, 2)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            counters["in_flight"] -= 1
+            semaphore.release()
@@ -1,16 +1,29 @@
+import time
+_IMPORT_START = time.perf_counter()  # Measured startup: imports through ready
+
 import os
-from fastapi import FastAPI, HTTPException
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
-import time
 from models import (
     RepoAnalysisRequest, 
+    BatchAnalysisRequest,
     RepoAnalysisResponse, 
     ChatRequest, 
-    ChatResponse
+    ChatResponse,
+    SearchRequest,
+    SearchResponse
 )
 from services.github_service import GitHubService
 from services.gemini_service import GeminiService
+from services.search_service import TrigramIndex
+from services.analysis_store import AnalysisStore
+from admission import AdmissionController, AdmissionMiddleware, EXPENSIVE_COST
 
 # Load environment variables
 load_dotenv()
@@ -22,21 +35,28 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
+# Admission control: per-client rate limits, per-class concurrency, load shedding
+# (added before CORS so that 429/503 responses still carry CORS headers)
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Configure CORS (CORS_ALLOW_ORIGINS is a comma-separated list; "*" by default)
+CORS_ALLOW_ORIGINS = [o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
+    allow_origins=CORS_ALLOW_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# Initialize services
+# Initialize services (cheap: the GitHub and Gemini SDKs are imported on first use,
+# and GEMINI_API_KEY is only required once an AI feature is called)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is required")
+    print("⚠️ GEMINI_API_KEY is not set; AI chat will be unavailable", flush=True)
 
 github_service = GitHubService(github_token=GITHUB_TOKEN)
 gemini_service = GeminiService(api_key=GEMINI_API_KEY)
@@ -44,6 +64,112 @@ gemini_service = GeminiService(api_key=GEMINI_API_KEY)
 # In-memory cache for repository data (in production, use Redis or similar)
 repo_cache = {}
 
+# Completed analyses persisted across restarts, keyed by repo URL and commit SHA
+# (set ANALYSIS_DB_PATH to an empty string to disable)
+ANALYSIS_DB_PATH = os.getenv("ANALYSIS_DB_PATH", "analysis_store.db")
+ANALYSIS_WARM_COUNT = int(os.getenv("ANALYSIS_WARM_COUNT", "20"))
+analysis_store = AnalysisStore(ANALYSIS_DB_PATH) if ANALYSIS_DB_PATH else None
+
+# Bounded pool shared by all batch requests; workers share github_service,
+# and with it the GitHub request budget and blob cache
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+
+
+def record_cache_hit(repo_url: str, cached_data):
+    """Count a use of an in-memory analysis towards the store's hot repositories"""
+    if analysis_store and isinstance(cached_data, dict) and cached_data.get('commit_sha'):
+        try:
+            analysis_store.touch(repo_url, cached_data['commit_sha'])
+        except Exception as e:
+            print(f"[STORE] Failed to record cache hit: {e}", flush=True)
+
+
+def get_cached_files(repo_url: str, count_hit: bool = True) -> dict:
+    """Return cached files for a repository, fetching them if not yet analyzed"""
+    if repo_url in repo_cache:
+        if count_hit:
+            record_cache_hit(repo_url, repo_cache[repo_url])
+    elif analysis_store:
+        stored = analysis_store.load(repo_url, count_hit=count_hit)
+        if stored:
+            repo_cache[repo_url] = stored
+    
+    if repo_url not in repo_cache:
+        files_content = github_service.fetch_repository_files(
+            repo_url=repo_url,
+            max_files=50
+        )
+        repo_cache[repo_url] = {'files_content': files_content}
+        return files_content
+    
+    # Access files_content from the cache dictionary
+    cached_data = repo_cache[repo_url]
+    if isinstance(cached_data, dict) and 'files_content' in cached_data:
+        return cached_data['files_content']
+    # Old cache format, use directly
+    return cached_data
+
+
+def get_search_index(repo_url: str, count_hit: bool = True) -> TrigramIndex:
+    """Return the trigram index for a repository, building it on first use"""
+    files_content = get_cached_files(repo_url, count_hit)
+    cached_data = repo_cache[repo_url]
+    if not isinstance(cached_data, dict):
+        cached_data = repo_cache[repo_url] = {'files_content': files_content}
+    if 'search_index' not in cached_data:
+        cached_data['search_index'] = TrigramIndex(files_content)
+    return cached_data['search_index']
+
+
+def warm_repo_cache():
+    """Load the most used stored analyses into repo_cache"""
+    start = time.time()
+    warmed = 0
+    for repo_url in analysis_store.hot_repos(ANALYSIS_WARM_COUNT):
+        if repo_url in repo_cache:
+            continue
+        stored = analysis_store.load(repo_url, count_hit=False)
+        if stored:
+            repo_cache.setdefault(repo_url, stored)
+            warmed += 1
+    print(f"[STORE] Warmed {warmed} analyses from {ANALYSIS_DB_PATH} in {time.time() - start:.2f}s", flush=True)
+
+
+def warm_gemini_service():
+    """Import the Gemini SDK and build its models off the request path"""
+    start = time.perf_counter()
+    try:
+        gemini_service.warm_up()
+        print(f"[STARTUP] Gemini models ready in {(time.perf_counter() - start) * 1000:.0f} ms", flush=True)
+    except Exception as e:
+        print(f"[STARTUP] Gemini warm-up failed: {e}", flush=True)
+
+
+@app.on_event("startup")
+def start_background_warming():
+    """Warm caches and SDKs in the background so startup is not blocked on them"""
+    if analysis_store and ANALYSIS_WARM_COUNT > 0:
+        threading.Thread(target=warm_repo_cache, name="cache-warm", daemon=True).start()
+    if GEMINI_API_KEY:
+        threading.Thread(target=warm_gemini_service, name="gemini-warm", daemon=True).start()
+    print(f"[STARTUP] Ready in {(time.perf_counter() - _IMPORT_START) * 1000:.0f} ms", flush=True)
+
+
+def build_analysis_response(entry: dict) -> RepoAnalysisResponse:
+    """Build an analysis response from a repo_cache entry"""
+    files_content = entry['files_content']
+    return RepoAnalysisResponse(
+        repo_name=entry['repo_name'],
+        total_files=len(files_content),
+        mermaid_graph=entry['result']['mermaid_graph'],
+        summary=entry['result']['summary'],
+        files_analyzed=list(files_content.keys()),
+        tech_stack=entry['tech_stack'],
+        tech_stack_analysis=entry['tech_stack_analysis'],
+        repo_summary=entry['repo_summary']
+    )
+
 
 @app.get("/")
 async def root():
@@ -55,100 +181,200 @@ async def root():
     }
 
 
-@app.post("/api/analyze", response_model=RepoAnalysisResponse)
-def analyze_repository(request: RepoAnalysisRequest):
+def run_analysis(repo_url: str) -> RepoAnalysisResponse:
     """
-    Analyze a GitHub repository and generate visualization
+    Fetch, analyze and cache a single repository
+    
+    Args:
+        repo_url: GitHub repository URL
+        
+    Returns:
+        Analysis response for the repository
     """
     total_start = time.time()  # Start timing
     print(f"\n{'='*60}", flush=True)
-    print(f"[API] Received analyze request for: {request.repo_url}", flush=True)
+    print(f"[API] Received analyze request for: {repo_url}", flush=True)
+    
+    # Fetch repository metadata
+    print(f"[API] Fetching repo metadata...", flush=True)
+    repo_metadata = github_service.get_repo_metadata(repo_url)
+    print(f"[API] Repo name: {repo_metadata['name']}", flush=True)
+    
+    # Reuse a stored analysis of the same commit
+    commit_sha = None
+    if analysis_store:
+        try:
+            commit_sha = github_service.get_head_sha(repo_url, repo_metadata['default_branch'])
+        except Exception as e:
+            print(f"[STORE] Could not resolve head commit: {e}", flush=True)
+        cached = repo_cache.get(repo_url)
+        if commit_sha and isinstance(cached, dict) and cached.get('commit_sha') == commit_sha and 'result' in cached:
+            print(f"[API] ✅ Analysis of {commit_sha[:7]} already in memory", flush=True)
+            record_cache_hit(repo_url, cached)
+            return build_analysis_response(cached)
+        stored = analysis_store.load(repo_url, commit_sha) if commit_sha else None
+        if stored:
+            repo_cache[repo_url] = stored
+            print(f"[STORE] ✅ Loaded analysis of {commit_sha[:7]} in {time.time() - total_start:.2f}s", flush=True)
+            return build_analysis_response(stored)
+    
+    # Fetch repository files
+    print(f"[API] Fetching repository files...", flush=True)
+    files_content = github_service.fetch_repository_files(
+        repo_url=repo_url,
+        max_files=50
+    )
+    print(f"[API] Fetched {len(files_content)} files", flush=True)
+    
+    if not files_content:
+        raise HTTPException(
+            status_code=404, 
+            detail="No files found in repository with specified extensions"
+        )
+    
+    # Detect technology stack (LOCAL - FAST)
+    print(f"[API] Detecting technology stack...", flush=True)
+    tech_stack = gemini_service.detect_tech_stack(files_content)
+    print(f"[API] Tech stack: {tech_stack}", flush=True)
+    
+    # LOCAL tech stack analysis (NO AI - INSTANT)
+    print(f"[API] Generating tech stack description...", flush=True)
+    tech_parts = []
+    if tech_stack["languages"]:
+        tech_parts.append(f"Built with {', '.join(tech_stack['languages'][:2])}")
+    if tech_stack["frameworks"]:
+        tech_parts.append(f"using {', '.join(tech_stack['frameworks'][:2])}")
+    tech_stack_analysis = ". ".join(tech_parts) + "." if tech_parts else "Software application."
+    print(f"[API] ✅ Tech stack: {tech_stack_analysis}", flush=True)
+    
+    # LOCAL repository summary (NO AI - INSTANT)
+    print(f"[API] Generating repository summary...", flush=True)
+    file_count = len(files_content)
+    file_types = {}
+    for path in files_content.keys():
+        ext = path.split('.')[-1] if '.' in path else 'other'
+        file_types[ext] = file_types.get(ext, 0) + 1
+    top_types = sorted(file_types.items(), key=lambda x: x[1], reverse=True)[:3]
+    type_desc = ", ".join([f"{count} {ext} files" for ext, count in top_types])
+    lang_desc = ', '.join(tech_stack['languages'][:2]) if tech_stack['languages'] else 'various technologies'
+    repo_summary = f"{repo_metadata['name']} is a software repository containing {file_count} files ({type_desc}). The project uses {lang_desc} and includes components for software development. This codebase appears to be a {tech_stack['frameworks'][0] if tech_stack['frameworks'] else 'general'} application with well-organized structure."
+    print(f"[API] ✅ Summary generated", flush=True)
+    
+    # Generate Mermaid visualization
+    print(f"[API] Generating visualization...", flush=True)
+    result = gemini_service.generate_mermaid_graph(files_content, repo_metadata['name'])
+    print(f"[API] Visualization generated", flush=True)
+    
+    # Build code search index
+    print(f"[API] Building search index...", flush=True)
+    search_index = TrigramIndex(files_content)
+    print(f"[API] Indexed {len(search_index.postings)} trigrams", flush=True)
+    
+    # Cache the result to avoid repeated API calls
+    repo_cache[repo_url] = {
+        'repo_name': repo_metadata['name'],
+        'commit_sha': commit_sha,
+        'files_content': files_content,
+        'search_index': search_index,
+        'result': result,
+        'tech_stack': tech_stack,
+        'tech_stack_analysis': tech_stack_analysis,
+        'repo_summary': repo_summary
+    }
+    
+    # Persist for warm restarts
+    if analysis_store and commit_sha:
+        try:
+            analysis_store.save(repo_url, commit_sha, repo_cache[repo_url])
+        except Exception as e:
+            print(f"[STORE] Failed to persist analysis: {e}", flush=True)
+    
+    total_time = time.time() - total_start
+    print(f"\n[API] ✅ Analysis complete!")
+    print(f"[API] 📊 Total time: {total_time:.2f}s")
+    print(f"{'='*60}\n", flush=True)
+    
+    return build_analysis_response(repo_cache[repo_url])
+
 
-    # ... implementation (no changes needed inside) ...
+@app.post("/api/analyze", response_model=RepoAnalysisResponse)
+def analyze_repository(request: RepoAnalysisRequest):
+    """
+    Analyze a GitHub repository and generate visualization
+    """
     try:
-        # Fetch repository metadata
-        print(f"[API] Fetching repo metadata...", flush=True)
-        repo_metadata = github_service.get_repo_metadata(request.repo_url)
-        print(f"[API] Repo name: {repo_metadata['name']}", flush=True)
-        
-        # Fetch repository files
-        print(f"[API] Fetching repository files...", flush=True)
-        files_content = github_service.fetch_repository_files(
-            repo_url=request.repo_url,
-            max_files=50
-        )
-        print(f"[API] Fetched {len(files_content)} files", flush=True)
-        
-        if not files_content:
-            raise HTTPException(
-                status_code=404, 
-                detail="No files found in repository with specified extensions"
-            )
-        
-        # Detect technology stack (LOCAL - FAST)
-        print(f"[API] Detecting technology stack...", flush=True)
-        tech_stack = gemini_service.detect_tech_stack(files_content)
-        print(f"[API] Tech stack: {tech_stack}", flush=True)
-        
-        # LOCAL tech stack analysis (NO AI - INSTANT)
-        print(f"[API] Generating tech stack description...", flush=True)
-        tech_parts = []
-        if tech_stack["languages"]:
-            tech_parts.append(f"Built with {', '.join(tech_stack['languages'][:2])}")
-        if tech_stack["frameworks"]:
-            tech_parts.append(f"using {', '.join(tech_stack['frameworks'][:2])}")
-        tech_stack_analysis = ". ".join(tech_parts) + "." if tech_parts else "Software application."
-        print(f"[API] ✅ Tech stack: {tech_stack_analysis}", flush=True)
-        
-        # LOCAL repository summary (NO AI - INSTANT)
-        print(f"[API] Generating repository summary...", flush=True)
-        file_count = len(files_content)
-        file_types = {}
-        for path in files_content.keys():
-            ext = path.split('.')[-1] if '.' in path else 'other'
-            file_types[ext] = file_types.get(ext, 0) + 1
-        top_types = sorted(file_types.items(), key=lambda x: x[1], reverse=True)[:3]
-        type_desc = ", ".join([f"{count} {ext} files" for ext, count in top_types])
-        lang_desc = ', '.join(tech_stack['languages'][:2]) if tech_stack['languages'] else 'various technologies'
-        repo_summary = f"{repo_metadata['name']} is a software repository containing {file_count} files ({type_desc}). The project uses {lang_desc} and includes components for software development. This codebase appears to be a {tech_stack['frameworks'][0] if tech_stack['frameworks'] else 'general'} application with well-organized structure."
-        print(f"[API] ✅ Summary generated", flush=True)
-        
-        # Generate Mermaid visualization
-        print(f"[API] Generating visualization...", flush=True)
-        result = gemini_service.generate_mermaid_graph(files_content, repo_metadata['name'])
-        print(f"[API] Visualization generated", flush=True)
-        
-        # Cache the result to avoid repeated API calls
-        repo_cache[request.repo_url] = {
-            'files_content': files_content,
-            'result': result,
-            'tech_stack': tech_stack,
-            'tech_stack_analysis': tech_stack_analysis,
-            'repo_summary': repo_summary
-        }
-        
-        total_time = time.time() - total_start
-        print(f"\n[API] ✅ Analysis complete!")
-        print(f"[API] 📊 Total time: {total_time:.2f}s")
-        print(f"{'='*60}\n", flush=True)
-        
-        return RepoAnalysisResponse(
-            repo_name=repo_metadata['name'],
-            total_files=len(files_content),
-            mermaid_graph=result['mermaid_graph'],
-            summary=result['summary'],
-            files_analyzed=list(files_content.keys()),
-            tech_stack=tech_stack,
-            tech_stack_analysis=tech_stack_analysis,
-            repo_summary=repo_summary
-        )
-        
+        return run_analysis(request.repo_url)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+@app.post("/api/analyze/batch")
+def analyze_batch(request: BatchAnalysisRequest, http_request: Request):
+    """
+    Analyze many repositories, streaming one NDJSON line per repository as it
+    completes, followed by a summary line with an aggregate tech-stack rollup
+    """
+    try:
+        repo_urls = list(request.repo_urls or [])
+        if request.org:
+            repo_urls += github_service.list_org_repos(request.org, max_repos=request.max_repos)
+        repo_urls = list(dict.fromkeys(repo_urls))[:request.max_repos]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+    
+    if not repo_urls:
+        raise HTTPException(status_code=400, detail="Provide repo_urls or an org with repositories")
+    
+    # Admission charged one analysis; charge the client for the rest, so a
+    # large batch delays its next requests in proportion to its size
+    admission.charge(admission.client_key(http_request.scope), EXPENSIVE_COST * (len(repo_urls) - 1))
+    
+    print(f"[BATCH] Scheduling {len(repo_urls)} repositories ({BATCH_CONCURRENCY} concurrent)", flush=True)
+    
+    def stream_results():
+        batch_start = time.time()
+        futures = {batch_executor.submit(run_analysis, url): url for url in repo_urls}
+        rollup = {"languages": Counter(), "frameworks": Counter(), "tools": Counter()}
+        succeeded = 0
+        try:
+            for future in as_completed(futures):
+                repo_url = futures[future]
+                try:
+                    analysis = future.result()
+                except Exception as e:
+                    detail = e.detail if isinstance(e, HTTPException) else str(e)
+                    yield json.dumps({"repo_url": repo_url, "status": "error", "error": detail}) + "\n"
+                    continue
+                
+                succeeded += 1
+                for category, items in (analysis.tech_stack or {}).items():
+                    rollup[category].update(items)
+                yield json.dumps({
+                    "repo_url": repo_url,
+                    "status": "ok",
+                    "analysis": analysis.model_dump()
+                }) + "\n"
+        finally:
+            # Client went away: don't keep queued repos occupying the pool
+            for future in futures:
+                future.cancel()
+        
+        yield json.dumps({
+            "status": "complete",
+            "total": len(repo_urls),
+            "succeeded": succeeded,
+            "failed": len(repo_urls) - succeeded,
+            "elapsed_seconds": round(time.time() - batch_start, 2),
+            "tech_stack_rollup": {
+                category: dict(counter.most_common()) for category, counter in rollup.items()
+            }
+        }) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 def chat_about_code(request: ChatRequest):
     """
@@ -156,20 +382,7 @@ def chat_about_code(request: ChatRequest):
     """
     try:
         # Get files from cache or fetch them
-        if request.repo_url not in repo_cache:
-            files_content = github_service.fetch_repository_files(
-                repo_url=request.repo_url,
-                max_files=50
-            )
-            repo_cache[request.repo_url] = {'files_content': files_content}
-        else:
-            # Access files_content from the cache dictionary
-            cached_data = repo_cache[request.repo_url]
-            if isinstance(cached_data, dict) and 'files_content' in cached_data:
-                files_content = cached_data['files_content']
-            else:
-                # Old cache format, use directly
-                files_content = cached_data
+        files_content = get_cached_files(request.repo_url)
         
         if not files_content:
             raise HTTPException(
@@ -184,16 +397,69 @@ def chat_about_code(request: ChatRequest):
             context=request.context
         )
         
+        # Cite code locations matching terms from the question
+        code_snippets = get_search_index(request.repo_url, count_hit=False).find_citations(request.question)
+        relevant_files = result.get("relevant_files", [])
+        if code_snippets:
+            cited_files = list(dict.fromkeys(snippet["file"] for snippet in code_snippets))
+            relevant_files = cited_files + [f for f in relevant_files if f not in cited_files]
+        
         return ChatResponse(
             answer=result["answer"],
-            relevant_files=result.get("relevant_files", []),
-            code_snippets=result.get("code_snippets", [])
+            relevant_files=relevant_files,
+            code_snippets=code_snippets or result.get("code_snippets", [])
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@app.post("/api/search", response_model=SearchResponse)
+def search_code(request: SearchRequest):
+    """
+    Search an analyzed repository's files for a literal string or regex
+    """
+    if len(request.query) < 1:
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    
+    try:
+        search_index = get_search_index(request.repo_url)
+        
+        start = time.perf_counter()
+        results = search_index.search(
+            request.query,
+            regex=request.regex,
+            case_sensitive=request.case_sensitive,
+            max_results=request.max_results
+        )
+        search_time_ms = (time.perf_counter() - start) * 1000
+        
+        return SearchResponse(
+            query=request.query,
+            total_matches=len(results),
+            files_matched=len({match["file"] for match in results}),
+            search_time_ms=round(search_time_ms, 3),
+            results=results
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+@app.get("/api/metrics")
+def get_metrics():
+    """
+    Admission control and model scheduler counters
+    """
+    return {
+        "admission": admission.stats(),
+        "model_scheduler": gemini_service.scheduler.stats(),
+        "repos_cached": len(repo_cache)
+    }
+
+
 @app.get("/api/repo/{owner}/{repo}/metadata")
 def get_repo_metadata(owner: str, repo: str):
     """
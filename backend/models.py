@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import Optional, List, Dict, Any
 
 
@@ -9,6 +9,13 @@ class RepoAnalysisRequest(BaseModel):
     file_extensions: Optional[List[str]] = [".py", ".js", ".ts", ".java", ".go", ".rs", ".cpp", ".c", ".h"]
 
 
+class BatchAnalysisRequest(BaseModel):
+    """Request model for analyzing many repositories (explicit list or a whole org)"""
+    repo_urls: Optional[List[str]] = None
+    org: Optional[str] = None
+    max_repos: int = Field(100, ge=1, le=500)
+
+
 class RepoAnalysisResponse(BaseModel):
     """Response model for repository analysis"""
     repo_name: str
@@ -33,3 +40,21 @@ class ChatResponse(BaseModel):
     answer: str
     relevant_files: Optional[List[str]] = []
     code_snippets: Optional[List[Dict[str, Any]]] = []
+
+
+class SearchRequest(BaseModel):
+    """Request model for code search within an analyzed repository"""
+    repo_url: str
+    query: str
+    regex: Optional[bool] = False
+    case_sensitive: Optional[bool] = False
+    max_results: int = Field(50, ge=1, le=500)
+
+
+class SearchResponse(BaseModel):
+    """Response model for code search"""
+    query: str
+    total_matches: int
+    files_matched: int
+    search_time_ms: float
+    results: List[Dict[str, Any]] = []
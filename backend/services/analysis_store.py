@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+
+# Analyses kept per repository; older commits are pruned on save
+KEEP_COMMITS_PER_REPO = int(os.getenv("ANALYSIS_KEEP_COMMITS", "3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    repo_url TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    repo_name TEXT NOT NULL,
+    manifest TEXT NOT NULL,
+    files_blob BLOB NOT NULL,
+    tech_stack TEXT,
+    tech_stack_analysis TEXT,
+    repo_summary TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (repo_url, commit_sha)
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_hot ON analyses (hits DESC, last_accessed DESC);
+"""
+
+
+class AnalysisStore:
+    """SQLite (WAL) store of completed analyses, keyed by repository URL and commit SHA"""
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the store
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def save(self, repo_url: str, commit_sha: str, entry: Dict[str, Any]):
+        """
+        Persist a completed analysis
+
+        File contents are stored as a single zlib-compressed JSON blob; the
+        manifest of paths and sizes is kept uncompressed for cheap inspection.
+        Re-saving a commit keeps its hit count, and only the newest
+        KEEP_COMMITS_PER_REPO commits of each repository are retained.
+
+        Args:
+            repo_url: GitHub repository URL
+            commit_sha: Commit the analysis was made at
+            entry: Repository cache entry (files_content, result, tech_stack, ...)
+        """
+        files_content = entry['files_content']
+        manifest = [[path, len(content)] for path, content in files_content.items()]
+        files_blob = zlib.compress(json.dumps(files_content).encode('utf-8'), 6)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO analyses (
+                    repo_url, commit_sha, repo_name, manifest, files_blob, tech_stack,
+                    tech_stack_analysis, repo_summary, result, created_at, last_accessed, hits
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT (repo_url, commit_sha) DO UPDATE SET
+                    repo_name = excluded.repo_name,
+                    manifest = excluded.manifest,
+                    files_blob = excluded.files_blob,
+                    tech_stack = excluded.tech_stack,
+                    tech_stack_analysis = excluded.tech_stack_analysis,
+                    repo_summary = excluded.repo_summary,
+                    result = excluded.result,
+                    created_at = excluded.created_at,
+                    last_accessed = excluded.last_accessed
+                """,
+                (
+                    repo_url,
+                    commit_sha,
+                    entry.get('repo_name', ''),
+                    json.dumps(manifest),
+                    files_blob,
+                    json.dumps(entry.get('tech_stack')),
+                    entry.get('tech_stack_analysis'),
+                    entry.get('repo_summary'),
+                    json.dumps(entry.get('result')),
+                    now,
+                    now
+                )
+            )
+            self._conn.execute(
+                """
+                DELETE FROM analyses
+                WHERE repo_url = ? AND commit_sha NOT IN (
+                    SELECT commit_sha FROM analyses WHERE repo_url = ?
+                    ORDER BY created_at DESC LIMIT ?
+                )
+                """,
+                (repo_url, repo_url, KEEP_COMMITS_PER_REPO)
+            )
+            self._conn.commit()
+
+    def load(
+        self,
+        repo_url: str,
+        commit_sha: Optional[str] = None,
+        count_hit: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored analysis in repository cache entry format
+
+        Args:
+            repo_url: GitHub repository URL
+            commit_sha: Exact commit to load; the most recent analysis if None
+            count_hit: Record this read as a use (False for cache warming)
+
+        Returns:
+            Cache entry dictionary, or None if nothing is stored
+        """
+        query = """
+            SELECT commit_sha, repo_name, files_blob, tech_stack, tech_stack_analysis,
+                   repo_summary, result
+            FROM analyses WHERE repo_url = ?
+        """
+        params = [repo_url]
+        if commit_sha:
+            query += " AND commit_sha = ?"
+            params.append(commit_sha)
+        query += " ORDER BY created_at DESC LIMIT 1"
+
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            if count_hit:
+                self._touch(repo_url, row[0])
+
+        sha, repo_name, files_blob, tech_stack, tech_stack_analysis, repo_summary, result = row
+        return {
+            'commit_sha': sha,
+            'repo_name': repo_name,
+            'files_content': json.loads(zlib.decompress(files_blob).decode('utf-8')),
+            'tech_stack': json.loads(tech_stack) if tech_stack else None,
+            'tech_stack_analysis': tech_stack_analysis,
+            'repo_summary': repo_summary,
+            'result': json.loads(result) if result else None
+        }
+
+    def touch(self, repo_url: str, commit_sha: str):
+        """
+        Record a use of an analysis served from memory rather than loaded
+
+        Args:
+            repo_url: GitHub repository URL
+            commit_sha: Commit of the analysis that was used
+        """
+        with self._lock:
+            self._touch(repo_url, commit_sha)
+
+    def _touch(self, repo_url: str, commit_sha: str):
+        """Bump hits and last_accessed for one analysis (caller holds the lock)"""
+        self._conn.execute(
+            "UPDATE analyses SET hits = hits + 1, last_accessed = ? WHERE repo_url = ? AND commit_sha = ?",
+            (time.time(), repo_url, commit_sha)
+        )
+        self._conn.commit()
+
+    def hot_repos(self, limit: int = 20) -> List[str]:
+        """
+        List the most frequently and recently used repositories
+
+        Args:
+            limit: Maximum number of repositories to return
+
+        Returns:
+            Repository URLs, hottest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT repo_url FROM analyses
+                GROUP BY repo_url
+                ORDER BY SUM(hits) DESC, MAX(last_accessed) DESC
+                LIMIT ?
+                """,
+                (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -1,8 +1,9 @@
 import os
 import json
 import sys
+import threading
 from typing import Dict, List, Optional
-import google.generativeai as genai
+from services.model_scheduler import ModelScheduler, PRIMARY_MODEL, FALLBACK_MODEL
 
 # Force flush for immediate output
 def log(msg):
@@ -13,10 +14,21 @@ def log(msg):
 class GeminiService:
     """Service to interact with Gemini 1.5 Pro for code analysis"""
     
-    def __init__(self, api_key: str):
-        """Initialize Gemini service with API key"""
-        genai.configure(api_key=api_key)
-        # Models are initialized per-function for better quota management
+    def __init__(self, api_key: Optional[str]):
+        """
+        Initialize Gemini service with API key
+        
+        The google-generativeai SDK is imported and configured on first use
+        (see get_model), so constructing the service is cheap and does not
+        require a key until an AI feature is called.
+        """
+        self.api_key = api_key
+        # Model objects are created once per model name and reused across requests
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self._genai = None
+        # Deadline-aware scheduling (hedging, Pro -> Flash fallback, quota breaker)
+        self.scheduler = ModelScheduler(self.get_model)
         # Configure generation settings
         self.generation_config = {
             "temperature": 0.5,
@@ -24,7 +36,37 @@ class GeminiService:
             "top_k": 40,
             "max_output_tokens": 4096,  # Pro supports larger output
         }
-        print(f"✅ Gemini service initialized with Pro model")
+    
+    def get_model(self, model_name: str):
+        """
+        Get a shared GenerativeModel, importing and configuring the SDK on first use
+        
+        Args:
+            model_name: Gemini model name, e.g. 'gemini-1.5-flash'
+            
+        Returns:
+            google.generativeai.GenerativeModel instance
+        """
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        
+        with self._models_lock:
+            if self._genai is None:
+                if not self.api_key:
+                    raise ValueError("GEMINI_API_KEY environment variable is required")
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+                log(f"✅ Gemini SDK configured")
+            if model_name not in self._models:
+                self._models[model_name] = self._genai.GenerativeModel(model_name)
+            return self._models[model_name]
+    
+    def warm_up(self):
+        """Import the SDK and build the default models ahead of the first request"""
+        for model_name in (FALLBACK_MODEL, PRIMARY_MODEL):
+            self.get_model(model_name)
     
     def create_code_context(self, files_content: Dict[str, str]) -> str:
         """
@@ -169,9 +211,6 @@ class GeminiService:
         if not any(tech_stack.values()):
             return "No technology stack detected."
         
-        # Use Flash model for quick analysis
-        flash_model = genai.GenerativeModel('gemini-1.5-flash')
-        
         stack_summary = []
         if tech_stack["languages"]:
             stack_summary.append(f"Languages: {', '.join(tech_stack['languages'])}")
@@ -188,9 +227,12 @@ Describe what type of application this stack is typically used for.
 ONE sentence only, be specific and concise. Use plain text, NO markdown formatting."""
 
         try:
-            response = pro_model.generate_content(
+            # Use Flash model for quick analysis
+            response = self.scheduler.generate(
+                "tech_stack",
                 prompt,
-                generation_config={"temperature": 0.7, "max_output_tokens": 1000}
+                {"temperature": 0.7, "max_output_tokens": 1000},
+                primary_model=FALLBACK_MODEL
             )
             return response.text.strip()
         except Exception as e:
@@ -214,9 +256,6 @@ ONE sentence only, be specific and concise. Use plain text, NO markdown formatti
         Returns:
             AI-generated summary of repository contents and functionality
         """
-        # Use Flash model for quick analysis
-        flash_model = genai.GenerativeModel('gemini-1.5-flash')
-        
         # Find README content
         readme_content = ""
         for file_path, content in files_content.items():
@@ -253,16 +292,17 @@ Write a detailed summary that explains:
 IMPORTANT: Write 10-15 complete lines. Do NOT truncate. Finish all sentences."""
 
         try:
-            # Reduced tokens for faster response
-            response = flash_model.generate_content(
+            # Flash model with reduced tokens for faster response
+            response = self.scheduler.generate(
+                "summary",
                 prompt,
-                generation_config={
+                {
                     "temperature": 0.4, 
                     "max_output_tokens": 400,  # Reduced for speed
                     "top_p": 0.95,
                     "top_k": 40
                 },
-                request_options={"timeout": 15}  # 15 second timeout
+                primary_model=FALLBACK_MODEL
             )
             return response.text.strip()
         except Exception as e:
@@ -331,9 +371,6 @@ IMPORTANT: Write 10-15 complete lines. Do NOT truncate. Finish all sentences."""
         """Answer questions using Gemini 1.5 Pro"""
         log(f"[CHAT] Question: {question}")
         
-        # Use Pro model for chat
-        pro_model = genai.GenerativeModel('gemini-1.5-pro')
-        
         code_context = self.create_code_context(files_content)
         limited_context = code_context[:15000]  # Limit context for speed
         
@@ -347,9 +384,11 @@ Question: {question}
 Provide a brief, helpful answer."""
 
         try:
-            response = pro_model.generate_content(
+            # Pro model, hedged and degraded to Flash if the chat deadline is at risk
+            response = self.scheduler.generate(
+                "chat",
                 prompt,
-                generation_config={"temperature": 0.7, "max_output_tokens": 500}
+                {"temperature": 0.7, "max_output_tokens": 500}
             )
             return {
                 "answer": response.text,
@@ -1,9 +1,114 @@
 import os
-from typing import List, Dict, Optional
-from github import Github, Repository, GithubException
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Dict, Optional
 import base64
+import codecs
 import re
 
+if TYPE_CHECKING:
+    from github import Repository
+
+
+# Content classification limits
+SNIFF_BYTES = 8192                 # Prefix inspected for binary/minified detection
+MAX_FILE_BYTES = 1_000_000         # Files above this are never ingested
+SAMPLE_THRESHOLD_BYTES = 100_000   # Files above this are stored as head/tail samples
+SAMPLE_HEAD_CHARS = 12_000
+SAMPLE_TAIL_CHARS = 4_000
+DECODE_CHUNK_CHARS = 64 * 1024     # Base64 characters decoded per step (multiple of 4)
+
+# Line separating the head and tail of a sampled file; records the omitted line
+# range so search can report real line numbers for the tail
+SAMPLE_MARKER = "... [sampled: {size}-byte file, lines {first}-{last} omitted] ..."
+SAMPLE_MARKER_RE = re.compile(r'^\.\.\. \[sampled: \d+-byte file, lines (\d+)-(\d+) omitted\] \.\.\.$')
+
+# Shared GitHub budget and blob cache (shared by every request on this service)
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+# Requests held back for other work; capped at 10% of the reported limit so the
+# unauthenticated 60/hour limit is still usable
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "100"))
+BLOB_CACHE_MAX_CHARS = int(os.getenv("BLOB_CACHE_MAX_CHARS", str(64 * 1024 * 1024)))
+
+# Generated or vendored files that are never worth the context
+GENERATED_SUFFIXES = ('.min.js', '.min.css', '.map', '.bundle.js', '.chunk.js')
+# Prose files legitimately have very long (unwrapped) lines
+PROSE_SUFFIXES = ('.md', '.markdown', '.txt', '.rst')
+PROSE_PREFIXES = ('readme', 'license', 'changelog', 'contributing')
+
+GENERATED_NAMES = ('package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'cargo.lock', 'composer.lock')
+
+
+def is_generated_path(file_path: str) -> bool:
+    """Check whether a path names a lockfile, source map or minified bundle"""
+    name = file_path.split('/')[-1].lower()
+    return name in GENERATED_NAMES or name.endswith(GENERATED_SUFFIXES)
+
+
+def is_prose_path(file_path: str) -> bool:
+    """Check whether a path names Markdown/plain-text documentation"""
+    name = file_path.split('/')[-1].lower()
+    return name.endswith(PROSE_SUFFIXES) or name.startswith(PROSE_PREFIXES)
+
+
+def classify_prefix(prefix: bytes, check_minified: bool = True) -> Optional[str]:
+    """
+    Sniff the first bytes of a file to decide whether it is worth ingesting
+    
+    Args:
+        prefix: Leading bytes of the file (up to SNIFF_BYTES)
+        check_minified: Apply the minified-code heuristic (off for prose files)
+        
+    Returns:
+        None for ordinary text, otherwise the rejection reason ("binary" or "minified")
+    """
+    if not prefix:
+        return None
+    if b'\x00' in prefix:
+        return "binary"
+    
+    # Control characters other than common whitespace indicate binary data
+    control = sum(1 for b in prefix if b < 32 and b not in (9, 10, 12, 13))
+    if control / len(prefix) > 0.1:
+        return "binary"
+    
+    if not check_minified:
+        return None
+    
+    # Minified code packs everything into a handful of very long lines with
+    # almost no whitespace (prose with unwrapped paragraphs is ~15% spaces)
+    lines = prefix.split(b'\n')
+    longest = max(len(line) for line in lines)
+    whitespace = prefix.count(b' ') + prefix.count(b'\t') + len(lines) - 1
+    if (
+        len(prefix) >= 2048 and longest > 1000 and len(prefix) / len(lines) > 300
+        and whitespace / len(prefix) < 0.08
+    ):
+        return "minified"
+    return None
+
+
+def iter_base64_chunks(encoded: str, chunk_chars: int = DECODE_CHUNK_CHARS):
+    """
+    Decode a (possibly newline-wrapped) base64 string in fixed-size steps
+    
+    Args:
+        encoded: Base64 payload as returned by the GitHub contents API
+        chunk_chars: Number of encoded characters consumed per step
+        
+    Yields:
+        Decoded byte chunks, in order
+    """
+    carry = ""
+    for start in range(0, len(encoded), chunk_chars):
+        piece = carry + "".join(encoded[start:start + chunk_chars].split())
+        usable = len(piece) - len(piece) % 4
+        carry = piece[usable:]
+        if usable:
+            yield base64.b64decode(piece[:usable])
+    if carry:
+        yield base64.b64decode(carry + "=" * (-len(carry) % 4))
+
 
 class GitHubService:
     """Service to fetch and parse files from GitHub repositories"""
@@ -11,8 +116,67 @@ class GitHubService:
     def __init__(self, github_token: Optional[str] = None):
         """Initialize GitHub service with optional token for higher rate limits"""
         # Treat empty string as None
-        token = github_token if github_token and github_token.strip() else None
-        self.github = Github(token) if token else Github()
+        self._token = github_token if github_token and github_token.strip() else None
+        # PyGithub is imported and the client built on first use (see github)
+        self._github = None
+        self._github_lock = threading.Lock()
+        
+        # One request budget shared by all concurrent analyses
+        self._request_slots = threading.BoundedSemaphore(GITHUB_MAX_CONCURRENCY)
+        
+        # Decoded file contents keyed by git blob SHA and whether the path is
+        # prose (identical files across forks, branches and repeat analyses are
+        # fetched once; the minified check depends on the path)
+        self._blob_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._blob_cache_chars = 0
+        self._blob_cache_lock = threading.Lock()
+    
+    @property
+    def github(self):
+        """Shared PyGithub client, created on first access"""
+        if self._github is None:
+            with self._github_lock:
+                if self._github is None:
+                    from github import Github
+                    self._github = Github(self._token) if self._token else Github()
+        return self._github
+    
+    def _call(self, fn, *args, **kwargs):
+        """
+        Make a GitHub API call within the shared concurrency and rate-limit budget
+        
+        Raises:
+            Exception: If the remaining rate limit is at or below the reserve
+                (GITHUB_RATE_LIMIT_RESERVE, at most 10% of the limit)
+        """
+        with self._request_slots:
+            remaining, limit = self.github.rate_limiting
+            reserve = min(GITHUB_RATE_LIMIT_RESERVE, limit // 10)
+            if 0 <= remaining <= reserve:
+                raise Exception(
+                    f"GitHub rate limit budget exhausted ({remaining} requests left, "
+                    f"resets at {self.github.rate_limiting_resettime})"
+                )
+            return fn(*args, **kwargs)
+    
+    def _cache_get(self, key: tuple) -> Optional[str]:
+        """Look up decoded content by (blob SHA, is prose path)"""
+        with self._blob_cache_lock:
+            content = self._blob_cache.get(key)
+            if content is not None:
+                self._blob_cache.move_to_end(key)
+            return content
+    
+    def _cache_put(self, key: tuple, content: str):
+        """Store decoded content by (blob SHA, is prose path), evicting least recently used entries"""
+        with self._blob_cache_lock:
+            if key in self._blob_cache:
+                return
+            self._blob_cache[key] = content
+            self._blob_cache_chars += len(content)
+            while self._blob_cache_chars > BLOB_CACHE_MAX_CHARS and len(self._blob_cache) > 1:
+                _sha, evicted = self._blob_cache.popitem(last=False)
+                self._blob_cache_chars -= len(evicted)
     
     def parse_repo_url(self, repo_url: str) -> tuple[str, str]:
         """
@@ -38,7 +202,7 @@ class GitHubService:
         
         raise ValueError(f"Invalid GitHub URL: {repo_url}")
     
-    def get_repository(self, repo_url: str) -> Repository.Repository:
+    def get_repository(self, repo_url: str) -> "Repository.Repository":
         """
         Get GitHub repository object
         
@@ -48,34 +212,131 @@ class GitHubService:
         Returns:
             PyGithub Repository object
         """
+        from github import GithubException
+        
         owner, repo_name = self.parse_repo_url(repo_url)
         try:
-            return self.github.get_repo(f"{owner}/{repo_name}")
+            return self._call(self.github.get_repo, f"{owner}/{repo_name}")
         except GithubException as e:
             raise Exception(f"Failed to fetch repository: {str(e)}")
     
-    def get_file_content(self, repo: Repository.Repository, file_path: str) -> str:
+    def get_file_content(
+        self, 
+        repo: "Repository.Repository", 
+        file_path: str,
+        sha: Optional[str] = None
+    ) -> str:
         """
         Get content of a specific file from repository
         
         Args:
             repo: PyGithub Repository object
             file_path: Path to file in repository
+            sha: Git blob SHA, if known, used to serve the file from the blob cache
             
         Returns:
             File content as string
         """
+        prose = is_prose_path(file_path)
+        if sha:
+            cached = self._cache_get((sha, prose))
+            if cached is not None:
+                return cached
+        
         try:
-            content = repo.get_contents(file_path)
+            content = self._call(repo.get_contents, file_path)
             if isinstance(content, list):
                 return ""
             
-            # Decode base64 content
-            return base64.b64decode(content.content).decode('utf-8', errors='ignore')
+            if content.size > MAX_FILE_BYTES:
+                print(f"Skipping {file_path}: {content.size} bytes exceeds size ceiling")
+                decoded = ""
+            elif not content.content:
+                print(f"Skipping {file_path}: empty file")
+                decoded = ""
+            else:
+                decoded = self._decode_content(file_path, content.content, content.size)
+            
+            # Rejected files are cached as "" so they are not fetched again
+            self._cache_put((content.sha, prose), decoded)
+            return decoded
         except Exception as e:
             print(f"Error reading file {file_path}: {str(e)}")
             return ""
     
+    def _decode_content(self, file_path: str, encoded: str, size: int) -> str:
+        """
+        Incrementally decode a base64 blob, rejecting binary/minified content
+        
+        Small files are returned whole. Files above SAMPLE_THRESHOLD_BYTES are
+        reduced to a head and tail sample while decoding, so the full decoded
+        text is never materialised. Both samples are cut at line boundaries and
+        joined by a SAMPLE_MARKER line naming the omitted lines.
+        
+        Args:
+            file_path: Path to file in repository (for logging)
+            encoded: Base64 content from the GitHub API
+            size: File size in bytes as reported by GitHub
+            
+        Returns:
+            Decoded text, a head/tail sample, or "" if the file was rejected
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        check_minified = not is_prose_path(file_path)
+        sampled = size > SAMPLE_THRESHOLD_BYTES
+        head_parts, head_len, tail = [], 0, ""
+        tail_seen = newlines = 0
+        prefix = b""
+        sniffed = False
+        
+        def consume(text: str):
+            nonlocal head_len, tail, tail_seen, newlines
+            newlines += text.count('\n')
+            room = SAMPLE_HEAD_CHARS - head_len if sampled else len(text)
+            if room > 0:
+                head_parts.append(text[:room])
+                head_len += min(room, len(text))
+                text = text[room:]
+            if text:
+                tail = (tail + text)[-SAMPLE_TAIL_CHARS:]
+                tail_seen += len(text)
+        
+        for chunk in iter_base64_chunks(encoded):
+            if not sniffed:
+                prefix += chunk
+                if len(prefix) < SNIFF_BYTES:
+                    continue
+                chunk, prefix, sniffed = prefix, b"", True
+                reason = classify_prefix(chunk[:SNIFF_BYTES], check_minified)
+                if reason:
+                    print(f"Skipping {file_path}: {reason} content")
+                    return ""
+            consume(decoder.decode(chunk))
+        
+        if not sniffed:
+            reason = classify_prefix(prefix, check_minified)
+            if reason:
+                print(f"Skipping {file_path}: {reason} content")
+                return ""
+            consume(decoder.decode(prefix))
+        consume(decoder.decode(b"", final=True))
+        
+        head = "".join(head_parts)
+        if not sampled:
+            return head
+        
+        # Drop the partial lines where the head ends and the tail begins
+        if tail and '\n' in head:
+            head = head[:head.rindex('\n') + 1]
+        elif not head.endswith('\n'):
+            head += '\n'
+        if tail_seen > len(tail) and '\n' in tail[:-1]:
+            tail = tail[tail.index('\n') + 1:]
+        first_omitted = head.count('\n') + 1
+        tail_start = newlines - tail.count('\n') + 1
+        marker = SAMPLE_MARKER.format(size=size, first=first_omitted, last=tail_start - 1)
+        return f"{head}{marker}\n{tail}"
+    
     def fetch_repository_files(
         self, 
         repo_url: str, 
@@ -132,7 +393,7 @@ class GitHubService:
                         
                         try:
                             current_count = traverse_contents_with_timeout(
-                                repo.get_contents(content.path), 
+                                self._call(repo.get_contents, content.path), 
                                 current_count
                             )
                         except Exception as e:
@@ -143,14 +404,20 @@ class GitHubService:
                         param_ext = any(content.path.endswith(ext) for ext in file_extensions)
                         special_file = content.name.lower().startswith(('readme', 'license', 'dockerfile', 'makefile'))
                         
+                        if (param_ext or special_file) and (
+                            is_generated_path(content.path) or content.size > MAX_FILE_BYTES
+                        ):
+                            print(f"Skipping {content.path}: generated or oversized file")
+                            continue
+                        
                         if param_ext or special_file:
-                            file_content = self.get_file_content(repo, content.path)
+                            file_content = self.get_file_content(repo, content.path, sha=content.sha)
                             if file_content:
                                 files_content[content.path] = file_content
                                 current_count += 1
                 return current_count
 
-            contents = repo.get_contents("")
+            contents = self._call(repo.get_contents, "")
             traverse_contents_with_timeout(contents)
         except Exception as e:
             # If we found at least some files, don't crash
@@ -180,5 +447,59 @@ class GitHubService:
             "language": repo.language,
             "stars": repo.stargazers_count,
             "forks": repo.forks_count,
-            "url": repo.html_url
+            "url": repo.html_url,
+            "default_branch": repo.default_branch
         }
+    
+    def get_head_sha(self, repo_url: str, branch: str) -> str:
+        """
+        Get the commit SHA at the head of a branch
+        
+        Args:
+            repo_url: GitHub repository URL
+            branch: Branch name
+            
+        Returns:
+            Commit SHA
+        """
+        owner, repo_name = self.parse_repo_url(repo_url)
+        repo = self.github.get_repo(f"{owner}/{repo_name}", lazy=True)
+        return self._call(repo.get_branch, branch).commit.sha
+    
+    def list_org_repos(self, org: str, max_repos: int = 100) -> List[str]:
+        """
+        List repository URLs for a GitHub organization (or user)
+        
+        Args:
+            org: Organization or user login
+            max_repos: Maximum number of repositories to return
+            
+        Returns:
+            List of repository URLs, excluding archived repositories and forks
+        """
+        from github import GithubException
+        
+        try:
+            try:
+                owner = self._call(self.github.get_organization, org)
+            except GithubException:
+                owner = self._call(self.github.get_user, org)
+            
+            # Fetch pages explicitly so each page request goes through the budget
+            paginated = owner.get_repos()
+            repo_urls = []
+            page_number = 0
+            while len(repo_urls) < max_repos:
+                page = self._call(paginated.get_page, page_number)
+                if not page:
+                    break
+                for repo in page:
+                    if repo.archived or repo.fork:
+                        continue
+                    repo_urls.append(repo.html_url)
+                    if len(repo_urls) >= max_repos:
+                        break
+                page_number += 1
+            return repo_urls
+        except GithubException as e:
+            raise Exception(f"Failed to list repositories for {org}: {str(e)}")
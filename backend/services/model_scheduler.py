@@ -0,0 +1,323 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+
+PRIMARY_MODEL = "gemini-1.5-pro"
+FALLBACK_MODEL = "gemini-1.5-flash"
+
+# End-to-end latency deadlines per endpoint, in seconds
+DEFAULT_DEADLINES = {
+    "chat": float(os.getenv("MODEL_DEADLINE_CHAT", "20")),
+    "summary": float(os.getenv("MODEL_DEADLINE_SUMMARY", "15")),
+    "tech_stack": float(os.getenv("MODEL_DEADLINE_TECH_STACK", "8")),
+}
+
+LATENCY_WINDOW = 200         # Recent samples kept per (endpoint, model)
+MIN_SAMPLES_FOR_P95 = 20     # Below this, fall back to fractions of the deadline
+HEDGE_DEFAULT_FRACTION = 0.5
+FALLBACK_DEFAULT_FRACTION = 0.35
+
+# Each request can hold up to three calls (primary, hedge, fallback) and losing
+# calls keep running, so size the pool from the expensive-endpoint admission limit
+POOL_WORKERS = int(os.getenv(
+    "MODEL_POOL_WORKERS",
+    str(3 * int(os.getenv("ADMISSION_EXPENSIVE_CONCURRENCY", "8")))
+))
+
+BREAKER_THRESHOLD = int(os.getenv("MODEL_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("MODEL_BREAKER_COOLDOWN", "60"))
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Check whether an SDK error means quota or rate limit exhaustion"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for one endpoint/model pair"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given percentile, or None until enough samples exist"""
+        with self._lock:
+            if len(self.samples) < MIN_SAMPLES_FOR_P95:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Opens after repeated quota errors and stays open for a cooldown period
+
+    After the cooldown the breaker is half-open: a single probe call is let
+    through, and its result closes the breaker or re-opens it for another
+    cooldown. A probe that never reports back is replaced after a cooldown.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the protected model (one probe at a time when half-open)"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = self.clock()
+            if now - self.opened_at < self.cooldown:
+                return False
+            if self.probe_at is not None and now - self.probe_at < self.cooldown:
+                return False
+            self.probe_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_quota_error(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_at is not None:
+                self.opened_at = self.clock()
+                self.probe_at = None
+                print("[SCHEDULER] Circuit re-opened after failed probe", flush=True)
+            elif self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = self.clock()
+                print(f"[SCHEDULER] Circuit opened after {self.failures} quota errors", flush=True)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probe_at is not None else "open"
+
+
+class ModelScheduler:
+    """
+    Runs model calls against per-endpoint latency deadlines
+
+    The primary call is hedged with a duplicate once it runs past the
+    endpoint's observed p95 (unless every pool worker is already busy, where
+    a hedge would only queue), and a fallback-model call is started when the
+    remaining time is about what the fallback typically needs. The first
+    successful response wins; late responses are discarded. Quota errors
+    on the primary model open a circuit breaker that routes calls straight
+    to the fallback until the cooldown passes.
+    """
+
+    def __init__(
+        self,
+        get_model: Callable[[str], Any],
+        primary_model: str = PRIMARY_MODEL,
+        fallback_model: str = FALLBACK_MODEL,
+        deadlines: Optional[Dict[str, float]] = None,
+        max_workers: int = POOL_WORKERS,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            get_model: Returns a model object with generate_content() for a model name
+            primary_model: Model used by default
+            fallback_model: Faster model used when the deadline is at risk
+            deadlines: Seconds allowed per endpoint (defaults to DEFAULT_DEADLINES)
+            max_workers: Threads available for in-flight model calls
+            breaker: Circuit breaker guarding the primary model
+        """
+        self.get_model = get_model
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model")
+        self.in_flight = 0
+        self.trackers: Dict[tuple, LatencyTracker] = {}
+        self.counters = {"calls": 0, "hedged": 0, "degraded": 0, "hedges_skipped": 0,
+                         "breaker_skips": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+
+    def _tracker(self, endpoint: str, model_name: str) -> LatencyTracker:
+        with self._lock:
+            key = (endpoint, model_name)
+            if key not in self.trackers:
+                self.trackers[key] = LatencyTracker()
+            return self.trackers[key]
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _call_finished(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _invoke(self, endpoint: str, model_name: str, prompt: str, generation_config: dict, timeout: float):
+        """Make one model call, recording its latency and quota errors"""
+        start = time.monotonic()
+        try:
+            response = self.get_model(model_name).generate_content(
+                prompt,
+                generation_config=generation_config,
+                request_options={"timeout": timeout}
+            )
+            # Touch text so blocked/empty responses fail here, not in the caller
+            response.text
+        except Exception as e:
+            if model_name == self.primary_model and is_quota_error(e):
+                self.breaker.record_quota_error()
+            raise
+        self._tracker(endpoint, model_name).record(time.monotonic() - start)
+        if model_name == self.primary_model:
+            self.breaker.record_success()
+        return response
+
+    def generate(
+        self,
+        endpoint: str,
+        prompt: str,
+        generation_config: dict,
+        primary_model: Optional[str] = None
+    ):
+        """
+        Generate content within the endpoint's deadline
+
+        Args:
+            endpoint: Key into the deadline table ("chat", "summary", ...)
+            prompt: Prompt text
+            generation_config: Generation settings passed to the model
+            primary_model: Override the scheduler's primary model for this call
+
+        Returns:
+            The first successful model response
+
+        Raises:
+            TimeoutError: If no call succeeds before the deadline
+            Exception: The last model error if every attempt failed
+        """
+        primary = primary_model or self.primary_model
+        deadline = self.deadlines.get(endpoint, max(self.deadlines.values()))
+        start = time.monotonic()
+        self._count("calls")
+
+        def elapsed():
+            return time.monotonic() - start
+
+        def submit(model_name):
+            timeout = max(deadline - elapsed(), 1.0)
+            with self._lock:
+                self.in_flight += 1
+            future = self.executor.submit(self._invoke, endpoint, model_name, prompt, generation_config, timeout)
+            future.add_done_callback(self._call_finished)
+            pending[future] = model_name
+
+        pending = {}
+        can_degrade = primary != self.fallback_model
+        if can_degrade and primary == self.primary_model and not self.breaker.allow():
+            self._count("breaker_skips")
+            primary = self.fallback_model
+            can_degrade = False
+        submit(primary)
+
+        hedge_at = self._tracker(endpoint, primary).percentile(95) or deadline * HEDGE_DEFAULT_FRACTION
+        fallback_need = self._tracker(endpoint, self.fallback_model).percentile(95) or deadline * FALLBACK_DEFAULT_FRACTION
+        fallback_at = max(deadline - fallback_need, hedge_at)
+        hedged = False
+        hedge_sent = False
+        last_error = None
+
+        while pending:
+            checkpoints = [deadline]
+            if not hedged:
+                checkpoints.append(hedge_at)
+            if can_degrade:
+                checkpoints.append(fallback_at)
+            now = elapsed()
+            upcoming = [c for c in checkpoints if c > now]
+            wait_for = min(upcoming) - now if upcoming else 0
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                model_name = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"[SCHEDULER] {endpoint} call to {model_name} failed: {e}", flush=True)
+                    continue
+                if model_name != primary:
+                    print(f"[SCHEDULER] {endpoint} served by fallback {model_name} in {elapsed():.2f}s", flush=True)
+                elif hedge_sent:
+                    print(f"[SCHEDULER] {endpoint} served by {model_name} in {elapsed():.2f}s (hedged)", flush=True)
+                return response
+
+            if elapsed() >= deadline:
+                break
+
+            # Everything failed so far: go straight to the fallback if we still can
+            if not pending and can_degrade:
+                self._count("degraded")
+                submit(self.fallback_model)
+                can_degrade = False
+                continue
+
+            if not hedged and elapsed() >= hedge_at and pending:
+                hedged = True
+                if self.in_flight >= self.max_workers:
+                    self._count("hedges_skipped")
+                else:
+                    self._count("hedged")
+                    submit(primary)
+                    hedge_sent = True
+
+            if can_degrade and elapsed() >= fallback_at:
+                self._count("degraded")
+                submit(self.fallback_model)
+                can_degrade = False
+
+        if pending:
+            self._count("deadline_exceeded")
+            raise TimeoutError(f"{endpoint} model call exceeded {deadline:.0f}s deadline")
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, breaker state and observed p95 latencies"""
+        with self._lock:
+            counters = dict(self.counters)
+            trackers = list(self.trackers.items())
+        return {
+            **counters,
+            "in_flight": self.in_flight,
+            "max_workers": self.max_workers,
+            "breaker": self.breaker.state,
+            "p95_seconds": {
+                f"{endpoint}:{model}": tracker.percentile(95) for (endpoint, model), tracker in trackers
+            }
+        }
@@ -0,0 +1,276 @@
+import re
+from array import array
+from typing import Any, Dict, List, Optional
+
+from services.github_service import SAMPLE_MARKER_RE
+
+
+# Words too common in questions to be useful as citation search terms
+STOPWORDS = {
+    "what", "where", "which", "when", "does", "this", "that", "there", "with",
+    "from", "have", "about", "into", "code", "file", "files", "function",
+    "explain", "show", "used", "uses", "work", "works", "repository", "repo",
+    "should", "would", "could", "how", "why", "the", "and", "for", "are",
+}
+
+REGEX_META = set(".^$*+?{}[]()|\\")
+# Hex digits following \x, \u and \U escapes
+ESCAPE_WIDTHS = {'x': 2, 'u': 4, 'U': 8}
+
+
+def extract_trigrams(text: str) -> set:
+    """Return the set of distinct lowercase trigrams in a string"""
+    lowered = text.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def required_literals(pattern: str) -> List[str]:
+    """
+    Extract literal runs that every match of a regex must contain
+
+    This is deliberately conservative: anything inside groups, character
+    classes or optional atoms is ignored, and patterns with alternation or
+    inline flags such as (?x) yield no literals at all (so every file
+    becomes a candidate).
+
+    Args:
+        pattern: Regular expression source
+
+    Returns:
+        List of lowercase literal substrings
+    """
+    if re.search(r'(?<!\\)\|', pattern):
+        return []
+    # Inline flags change how literals match (verbose mode ignores spaces)
+    if re.search(r'(?<!\\)\(\?[aiLmsux-]', pattern):
+        return []
+
+    runs, current = [], ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        start = i
+        literal = None
+        if c == '\\':
+            nxt = pattern[i + 1] if i + 1 < len(pattern) else ""
+            if nxt and not nxt.isalnum():
+                literal = nxt
+                i += 2
+            else:
+                # Class (\w), anchor (\b), backreference or numeric escape
+                # (\x41, \u00e9, \N{...}, \101): skip the whole escape and end
+                # the run, since its digits are not literal text
+                i += 2
+                if nxt in ESCAPE_WIDTHS:
+                    i += ESCAPE_WIDTHS[nxt]
+                elif nxt == 'N' and pattern.startswith('{', i):
+                    close = pattern.find('}', i)
+                    i = close + 1 if close != -1 else len(pattern)
+                elif nxt.isdigit():
+                    # Backreferences take up to two digits, octal escapes three
+                    while i < len(pattern) and pattern[i].isdigit() and i - start < 4:
+                        i += 1
+        elif c == '[':
+            # Skip the character class
+            i += 1
+            while i < len(pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+            i += 1
+        elif c in '*?{':
+            # Previous atom is optional or repeated an unknown number of times
+            current = current[:-1]
+            if c == '{':
+                close = pattern.find('}', i)
+                i = close + 1 if close != -1 else len(pattern)
+            else:
+                i += 1
+        elif c == '(':
+            depth += 1
+            i += 1
+        elif c == ')':
+            depth = max(depth - 1, 0)
+            i += 1
+        elif c in REGEX_META:
+            i += 1
+        else:
+            literal = c
+            i += 1
+
+        if literal is not None and depth == 0:
+            current += literal
+        elif current:
+            runs.append(current)
+            current = ""
+    if current:
+        runs.append(current)
+    return [run.lower() for run in runs if len(run) >= 3]
+
+
+def line_numbers(lines: List[str]) -> List[Optional[int]]:
+    """
+    Map line indexes of stored file content to real 1-based line numbers
+
+    Sampled files (see GitHubService._decode_content) hold a head and tail
+    separated by a marker line; tail lines are numbered from where they sit
+    in the original file and the marker itself gets None.
+
+    Args:
+        lines: Stored file content split into lines
+
+    Returns:
+        Line number for each entry of lines
+    """
+    for index, line in enumerate(lines):
+        match = SAMPLE_MARKER_RE.match(line) if line.startswith("... [sampled:") else None
+        if match:
+            tail_start = int(match.group(2)) + 1
+            return (
+                list(range(1, index + 1)) + [None]
+                + list(range(tail_start, tail_start + len(lines) - index - 1))
+            )
+    return list(range(1, len(lines) + 1))
+
+
+class TrigramIndex:
+    """In-memory trigram index over a repository's files for fast grep-style search"""
+
+    def __init__(self, files_content: Dict[str, str]):
+        """
+        Build the index
+
+        Postings are stored as compact unsigned-int arrays of file ids, one
+        entry per distinct trigram per file. File contents are referenced, not
+        copied.
+
+        Args:
+            files_content: Dictionary mapping file paths to contents
+        """
+        self.paths: List[str] = list(files_content.keys())
+        self.files_content = files_content
+        self.postings: Dict[str, array] = {}
+
+        for file_id, path in enumerate(self.paths):
+            for trigram in extract_trigrams(files_content[path]):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    posting = self.postings[trigram] = array('I')
+                posting.append(file_id)
+
+    def candidates(self, literals: List[str]) -> List[int]:
+        """
+        Find file ids that contain every trigram of the given literals
+
+        Args:
+            literals: Lowercase substrings that a match must contain
+
+        Returns:
+            Sorted list of candidate file ids
+        """
+        trigrams = set()
+        for literal in literals:
+            trigrams |= extract_trigrams(literal)
+        if not trigrams:
+            return list(range(len(self.paths)))
+
+        postings = []
+        for trigram in trigrams:
+            posting = self.postings.get(trigram)
+            if posting is None:
+                return []
+            postings.append(posting)
+
+        # Intersect smallest posting lists first
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return sorted(result)
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        max_results: int = 50,
+        context_lines: int = 2
+    ) -> List[Dict[str, Any]]:
+        """
+        Search indexed files line by line for a literal or regex query
+
+        Args:
+            query: Literal string or regular expression
+            regex: Treat the query as a regular expression
+            case_sensitive: Match case exactly
+            max_results: Maximum number of matches to return
+            context_lines: Lines of context around each match
+
+        Returns:
+            List of matches with file, line, lines ("start-end" of the
+            snippet), text, start_line and snippet
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            pattern = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+
+        literals = required_literals(query) if regex else [query.lower()]
+        matches = []
+        for file_id in self.candidates(literals):
+            path = self.paths[file_id]
+            lines = self.files_content[path].splitlines()
+            numbers = line_numbers(lines) if "... [sampled:" in self.files_content[path] else None
+            for line_no, line in enumerate(lines):
+                if numbers and numbers[line_no] is None or not pattern.search(line):
+                    continue
+                start = max(line_no - context_lines, 0)
+                end = min(line_no + context_lines + 1, len(lines))
+                if numbers:
+                    start_line = numbers[start] or numbers[start + 1]
+                    end_line = numbers[end - 1] or numbers[end - 2]
+                else:
+                    start_line, end_line = start + 1, end
+                matches.append({
+                    "file": path,
+                    "line": numbers[line_no] if numbers else line_no + 1,
+                    "lines": f"{start_line}-{end_line}",
+                    "text": line.strip(),
+                    "start_line": start_line,
+                    "snippet": "\n".join(lines[start:end])
+                })
+                if len(matches) >= max_results:
+                    return matches
+        return matches
+
+    def find_citations(self, question: str, max_snippets: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find code snippets relevant to a natural-language question
+
+        Identifier-like terms from the question are searched longest first,
+        taking the first couple of hits for each.
+
+        Args:
+            question: User question
+            max_snippets: Maximum number of snippets to return
+
+        Returns:
+            List of matches in the same shape as search(), plus an
+            explanation naming the matched term
+        """
+        words = (word.strip('.') for word in re.findall(r'[A-Za-z_][A-Za-z0-9_.]{3,}', question))
+        terms = {word for word in words if len(word) >= 4 and word.lower() not in STOPWORDS}
+        citations, seen = [], set()
+        for term in sorted(terms, key=lambda term: (-len(term), term)):
+            for match in self.search(term, max_results=2):
+                key = (match["file"], match["line"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                match["explanation"] = f"Matches `{term}` from the question"
+                citations.append(match)
+                if len(citations) >= max_snippets:
+                    return citations
+        return citations
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionMiddleware, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", fake)
+    return fake
+
+
+def http_scope(path, client="10.0.0.1", forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return {"type": "http", "method": "POST", "path": path, "headers": headers, "client": (client, 5000)}
+
+
+async def call(middleware, scope):
+    """Run one request through the middleware; returns (status, headers, body)"""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), body
+
+
+def blocking_app(release: asyncio.Event):
+    async def app(scope, receive, send):
+        if scope["path"] != "/api/health":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+
+    assert bucket.take(5) == 0
+    assert bucket.take(5) == 0
+    assert bucket.take(5) == pytest.approx(5)
+
+    clock.now += 3
+    assert bucket.take(5) == pytest.approx(2)
+    clock.now += 100
+    assert bucket.take(10) == 0
+
+
+def test_charge_puts_bucket_into_debt(clock):
+    controller = AdmissionController()
+
+    assert controller.take_tokens("a", 5) == 0
+    assert controller.charge("a", 15) == pytest.approx(10)
+    assert controller.take_tokens("a", 1) == pytest.approx(11)
+    assert controller.take_tokens("b", 1) == 0
+
+    clock.now += 11
+    assert controller.take_tokens("a", 1) == 0
+
+
+def test_rate_limited_request_gets_429_with_retry_after(clock):
+    controller = AdmissionController()
+    middleware = AdmissionMiddleware(blocking_app(asyncio.Event()), controller)
+    controller.charge("10.0.0.1", 20)
+
+    status, headers, body = asyncio.run(call(middleware, http_scope("/api/chat")))
+
+    assert status == 429
+    assert headers[b"retry-after"] == b"15"
+    assert json.loads(body)["detail"]
+    assert controller.counters["expensive"]["rate_limited"] == 1
+
+
+def test_request_without_a_slot_is_shed():
+    controller = AdmissionController()
+    controller.classes["expensive"].update(limit=1, max_queue=0.05)
+    release = asyncio.Event()
+    middleware = AdmissionMiddleware(blocking_app(release), controller)
+
+    async def scenario():
+        first = asyncio.create_task(call(middleware, http_scope("/api/chat", client="10.0.0.1")))
+        await asyncio.sleep(0.01)
+        second = await call(middleware, http_scope("/api/search", client="10.0.0.2"))
+        release.set()
+        return (await first)[0], second[0]
+
+    assert asyncio.run(scenario()) == (200, 503)
+    assert controller.counters["expensive"]["shed"] == 1
+    assert controller.counters["expensive"]["in_flight"] == 0
+
+
+def test_batch_streams_do_not_hold_expensive_slots():
+    controller = AdmissionController()
+    controller.classes["batch"].update(limit=1, max_queue=0.05)
+    controller.classes["expensive"].update(limit=1, max_queue=0.05)
+    release = asyncio.Event()
+    middleware = AdmissionMiddleware(blocking_app(release), controller)
+
+    async def scenario():
+        batch = asyncio.create_task(call(middleware, http_scope("/api/analyze/batch", client="10.0.0.1")))
+        await asyncio.sleep(0.01)
+        second_batch = await call(middleware, http_scope("/api/analyze/batch", client="10.0.0.2"))
+        chat = asyncio.create_task(call(middleware, http_scope("/api/chat", client="10.0.0.3")))
+        await asyncio.sleep(0.01)
+        release.set()
+        return (await batch)[0], second_batch[0], (await chat)[0]
+
+    assert asyncio.run(scenario()) == (200, 503, 200)
+    assert controller.counters["batch"]["shed"] == 1
+    assert controller.counters["expensive"]["shed"] == 0
+
+
+def test_client_key_uses_hop_added_by_trusted_proxy(monkeypatch):
+    controller = AdmissionController()
+    spoofed = "1.2.3.4, 203.0.113.7"
+
+    assert controller.client_key(http_scope("/", client="10.0.0.9", forwarded_for=spoofed)) == "10.0.0.9"
+
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 1)
+    assert controller.client_key(http_scope("/", client="10.0.0.9", forwarded_for=spoofed)) == "203.0.113.7"
+    assert controller.client_key(http_scope("/", client="10.0.0.9", forwarded_for="203.0.113.7")) == "203.0.113.7"
+    assert controller.client_key(http_scope("/", client="10.0.0.9")) == "10.0.0.9"
+
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 2)
+    assert controller.client_key(http_scope("/", forwarded_for="9.9.9.9, 198.51.100.1, 10.1.1.1")) == "198.51.100.1"
@@ -0,0 +1,54 @@
+import pytest
+
+from services.analysis_store import AnalysisStore
+
+
+def entry(name):
+    return {'repo_name': name, 'files_content': {'main.py': 'print(1)\n'}, 'result': {'mermaid_code': 'graph TD'}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalysisStore(str(tmp_path / "analyses.db"))
+
+
+def hits(store, repo_url):
+    return store._conn.execute("SELECT SUM(hits) FROM analyses WHERE repo_url = ?", (repo_url,)).fetchone()[0]
+
+
+def test_load_round_trips_and_counts_hits(store):
+    store.save("https://github.com/a/one", "sha1", entry("one"))
+
+    loaded = store.load("https://github.com/a/one")
+    assert loaded['commit_sha'] == "sha1"
+    assert loaded['files_content'] == {'main.py': 'print(1)\n'}
+    assert hits(store, "https://github.com/a/one") == 1
+
+    store.load("https://github.com/a/one", count_hit=False)
+    assert hits(store, "https://github.com/a/one") == 1
+
+
+def test_touch_ranks_in_memory_hits(store):
+    store.save("https://github.com/a/warm", "sha1", entry("warm"))
+    store.save("https://github.com/a/cold", "sha2", entry("cold"))
+    store.load("https://github.com/a/cold")
+
+    for _ in range(3):
+        store.touch("https://github.com/a/warm", "sha1")
+
+    assert hits(store, "https://github.com/a/warm") == 3
+    assert store.hot_repos(1) == ["https://github.com/a/warm"]
+
+
+def test_resave_keeps_hits_and_old_commits_are_pruned(store, monkeypatch):
+    monkeypatch.setattr("services.analysis_store.KEEP_COMMITS_PER_REPO", 2)
+    repo = "https://github.com/a/repo"
+    store.save(repo, "sha1", entry("repo"))
+    store.touch(repo, "sha1")
+    store.save(repo, "sha1", entry("repo"))
+    assert hits(store, repo) == 1
+
+    store.save(repo, "sha2", entry("repo"))
+    store.save(repo, "sha3", entry("repo"))
+    assert store.load(repo, "sha1") is None
+    assert store.load(repo)['commit_sha'] == "sha3"
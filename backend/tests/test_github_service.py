@@ -0,0 +1,101 @@
+import base64
+
+from services.github_service import (
+    SAMPLE_HEAD_CHARS,
+    SAMPLE_MARKER_RE,
+    GitHubService,
+    classify_prefix,
+    iter_base64_chunks,
+)
+from services.search_service import TrigramIndex
+
+
+class FakeGithub:
+    rate_limiting = (5000, 5000)
+
+
+class FakeContent:
+    def __init__(self, text, sha="abc123"):
+        raw = text.encode("utf-8")
+        self.content = base64.encodebytes(raw).decode("ascii")
+        self.size = len(raw)
+        self.sha = sha
+
+
+class FakeRepo:
+    def __init__(self, files):
+        self.files = files
+        self.fetches = 0
+
+    def get_contents(self, path):
+        self.fetches += 1
+        return self.files[path]
+
+
+def make_service():
+    service = GitHubService()
+    service._github = FakeGithub()
+    return service
+
+
+def test_classify_prefix():
+    assert classify_prefix(b"def main():\n    return 1\n") is None
+    assert classify_prefix(b"\x89PNG\r\n\x1a\n\x00\x00") == "binary"
+
+    minified = b"var a=function(){return 1};" * 200
+    assert classify_prefix(minified) == "minified"
+    assert classify_prefix(minified, check_minified=False) is None
+
+    # An unwrapped prose paragraph is long but full of spaces
+    paragraph = b"This paragraph is never wrapped and keeps on going. " * 60
+    assert classify_prefix(paragraph) is None
+
+
+def test_iter_base64_chunks_handles_wrapping_and_small_steps():
+    raw = bytes(range(256)) * 7
+    encoded = base64.encodebytes(raw).decode("ascii")
+
+    for chunk_chars in (3, 4, 61, 1000):
+        assert b"".join(iter_base64_chunks(encoded, chunk_chars)) == raw
+
+
+def test_multibyte_characters_split_across_chunks(monkeypatch):
+    monkeypatch.setattr("services.github_service.DECODE_CHUNK_CHARS", 4)
+    text = "naïve café — 日本語 🚀\n" * 50
+    content = FakeContent(text)
+
+    service = make_service()
+    assert service._decode_content("notes.py", content.content, content.size) == text
+
+
+def test_sample_keeps_whole_lines_and_real_line_numbers():
+    lines = [f"line {n} " + "x" * 40 for n in range(1, 5001)]
+    content = FakeContent("\n".join(lines) + "\n")
+
+    sample = make_service()._decode_content("big.py", content.content, content.size)
+    sample_lines = sample.splitlines()
+    marker_at = next(i for i, line in enumerate(sample_lines) if SAMPLE_MARKER_RE.match(line))
+    head, tail = sample_lines[:marker_at], sample_lines[marker_at + 1:]
+
+    assert sum(len(line) + 1 for line in head) <= SAMPLE_HEAD_CHARS
+    assert set(head) <= set(lines)
+    assert set(tail) <= set(lines)
+    first, last = map(int, SAMPLE_MARKER_RE.match(sample_lines[marker_at]).groups())
+    assert first == len(head) + 1
+    assert tail[0] == lines[last]
+    assert tail[-1] == lines[-1]
+
+    match = TrigramIndex({"big.py": sample}).search("line 4990 ")[0]
+    assert match["line"] == 4990
+    assert match["text"] == lines[4989]
+
+
+def test_blob_cache_is_keyed_by_prose_path():
+    minified = "var a=function(){return 1};" * 200
+    repo = FakeRepo({"dist/app.js": FakeContent(minified), "docs/notes.txt": FakeContent(minified)})
+    service = make_service()
+
+    assert service.get_file_content(repo, "dist/app.js", sha="abc123") == ""
+    assert service.get_file_content(repo, "docs/notes.txt", sha="abc123") == minified
+    assert service.get_file_content(repo, "docs/notes.txt", sha="abc123") == minified
+    assert repo.fetches == 2
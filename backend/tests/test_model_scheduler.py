@@ -0,0 +1,167 @@
+import threading
+import time
+
+import pytest
+
+from services.model_scheduler import (
+    FALLBACK_MODEL,
+    PRIMARY_MODEL,
+    CircuitBreaker,
+    ModelScheduler,
+)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class ScriptedModel:
+    """Fake model whose Nth call sleeps (or raises) according to a script"""
+
+    def __init__(self, name, script):
+        self.name = name
+        self.script = script
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            step = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        time.sleep(step)
+        return FakeResponse(f"{self.name}:{step}")
+
+
+def make_scheduler(primary_script, fallback_script, deadline=1.0, **kwargs):
+    models = {
+        PRIMARY_MODEL: ScriptedModel("pro", primary_script),
+        FALLBACK_MODEL: ScriptedModel("flash", fallback_script),
+    }
+    scheduler = ModelScheduler(models.get, deadlines={"chat": deadline}, **kwargs)
+    return scheduler, models
+
+
+def test_fast_primary_is_not_hedged():
+    scheduler, models = make_scheduler([0.01], [0.01])
+
+    response = scheduler.generate("chat", "q", {})
+
+    assert response.text == "pro:0.01"
+    assert models[PRIMARY_MODEL].calls == 1
+    assert models[FALLBACK_MODEL].calls == 0
+    assert scheduler.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged():
+    # First call hangs, the hedge (second call) answers quickly
+    scheduler, models = make_scheduler([3.0, 0.01], [3.0])
+
+    start = time.monotonic()
+    response = scheduler.generate("chat", "q", {})
+
+    assert response.text == "pro:0.01"
+    assert time.monotonic() - start < 0.8
+    assert models[PRIMARY_MODEL].calls == 2
+    assert scheduler.stats()["hedged"] == 1
+
+
+def test_stuck_primary_degrades_to_fallback():
+    scheduler, models = make_scheduler([3.0], [0.05])
+
+    start = time.monotonic()
+    response = scheduler.generate("chat", "q", {})
+
+    assert response.text == "flash:0.05"
+    assert time.monotonic() - start < 1.0
+    assert scheduler.stats()["degraded"] == 1
+
+
+def test_deadline_exceeded_raises_timeout():
+    scheduler, _ = make_scheduler([3.0], [3.0], deadline=0.3)
+
+    with pytest.raises(TimeoutError):
+        scheduler.generate("chat", "q", {})
+    assert scheduler.stats()["deadline_exceeded"] == 1
+
+
+def test_hedge_skipped_when_pool_saturated():
+    # Two concurrent requests with stuck primaries fill both workers, so
+    # neither hedges: a duplicate would only queue behind the stuck calls
+    scheduler, models = make_scheduler([1.5], [1.5], max_workers=2)
+    outcome = []
+
+    def concurrent_request():
+        try:
+            scheduler.generate("chat", "q", {})
+            outcome.append("returned")
+        except TimeoutError:
+            outcome.append("timeout")
+
+    other = threading.Thread(target=concurrent_request)
+    other.start()
+    time.sleep(0.05)
+
+    with pytest.raises(TimeoutError):
+        scheduler.generate("chat", "q", {})
+    other.join()
+
+    assert outcome == ["timeout"]
+    assert models[PRIMARY_MODEL].calls == 2
+    assert scheduler.stats()["hedged"] == 0
+    assert scheduler.stats()["hedges_skipped"] == 2
+
+
+def test_quota_errors_open_breaker_and_route_to_fallback():
+    quota = Exception("429 Resource has been exhausted (e.g. check quota).")
+    scheduler, models = make_scheduler(
+        [quota], [0.01], breaker=CircuitBreaker(threshold=2, cooldown=60)
+    )
+
+    for _ in range(4):
+        assert scheduler.generate("chat", "q", {}).text == "flash:0.01"
+
+    stats = scheduler.stats()
+    assert stats["breaker"] == "open"
+    assert stats["breaker_skips"] == 2
+    assert models[PRIMARY_MODEL].calls == 2
+
+
+def test_half_open_breaker_admits_one_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=lambda: now[0])
+
+    breaker.record_quota_error()
+    assert not breaker.allow()
+
+    # Only the first caller after the cooldown probes; a failed probe re-opens
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record_quota_error()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    # A successful probe closes the breaker for everyone
+    now[0] = 20.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_cooldown():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=lambda: now[0])
+    breaker.record_quota_error()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    now[0] = 15.0
+    assert not breaker.allow()
+    now[0] = 20.0
+    assert breaker.allow()
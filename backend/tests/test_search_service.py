@@ -0,0 +1,48 @@
+import re
+
+import pytest
+
+from services.search_service import TrigramIndex, required_literals
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    (r"def \w+_handler", ["def ", "_handler"]),
+    (r"foo\.bar", ["foo.bar"]),
+    (r"foo\x41bar", ["foo", "bar"]),
+    (r"foo\u00e9bar", ["foo", "bar"]),
+    (r"foo\U0001F680bar", ["foo", "bar"]),
+    (r"foo\N{EM DASH}bar", ["foo", "bar"]),
+    (r"foo\101bar", ["foo", "bar"]),
+    (r"(foo)\1bar", ["bar"]),
+    (r"colou?r_name", ["colo", "r_name"]),
+    (r"foo|bar", []),
+    (r"(?x) foo bar", []),
+])
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+
+
+@pytest.mark.parametrize("pattern", [
+    r"foo\x41bar", r"fooAbar", r"foo\101bar", r"foo\N{LATIN CAPITAL LETTER A}bar",
+    r"(?i)FOOABAR", r"(?x) foo A bar", r"fo+A\w{3}",
+])
+def test_prefilter_never_drops_a_matching_file(pattern):
+    files = {"a.py": "x = fooAbar\n", "b.py": "nothing here\n"}
+    index = TrigramIndex(files)
+
+    expected = [path for path, text in files.items() if re.search(pattern, text, re.IGNORECASE)]
+    assert [match["file"] for match in index.search(pattern, regex=True)] == expected
+
+
+def test_matches_carry_line_range_and_citations_explain_themselves():
+    files = {"auth.py": "import os\n\n\ndef login(user, password):\n    return check(user)\n"}
+    index = TrigramIndex(files)
+
+    match = index.search("def login")[0]
+    assert match["line"] == 4
+    assert match["lines"] == "2-5"
+    assert match["start_line"] == 2
+
+    citation = index.find_citations("How does login work?")[0]
+    assert citation["lines"] == "2-5"
+    assert "login" in citation["explanation"]